@@ -1,21 +1,23 @@
+import io
 import os
 import re
 import logging
-import requests
+import aiofiles
+import aiohttp
 import asyncio
 import mimetypes
 import tempfile
 import time
-from urllib.parse import urlparse, unquote
-from typing import Optional, Tuple, Dict
+from collections import OrderedDict
+from functools import lru_cache
+from urllib.parse import urlparse, urlsplit, unquote
+from typing import Optional, Tuple
 from datetime import datetime
-import random
-from http.server import HTTPServer, BaseHTTPRequestHandler
-import threading
-from telegram import Update, InputFile
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, CallbackContext
-from telegram.constants import ParseMode
-from telegram.error import BadRequest
+from aiohttp import web
+from telegram import InputFile, Update
+from telegram.ext import (AIORateLimiter, Application, CommandHandler,
+                          MessageHandler, filters, CallbackContext)
+from telegram.error import TelegramError
 
 # Configure logging
 logging.basicConfig(
@@ -24,10 +26,31 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Load the mimetypes DB eagerly; the lazy first-call init reads system
+# mime.types files from disk and would stall the first download.
+mimetypes.init()
+
 # Configuration - Get from Environment Variables (for Render.com)
 BOT_TOKEN = os.environ.get('BOT_TOKEN')
 PORT = int(os.environ.get('PORT', 10000))  # Render.com provides PORT
+WEBHOOK_URL = os.environ.get('WEBHOOK_URL')  # e.g. https://myapp.onrender.com
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB Telegram limit
+# 512 KiB per iteration: large enough that Python loop and write
+# overhead is negligible for a 50 MB file (~100 iterations), small
+# enough to keep the pipeline queue memory bounded.
+DOWNLOAD_CHUNK_SIZE = 1 << 19
+# Files at least this large are fetched over several ranged connections
+# when the server supports ranges (see _download_ranges)
+PARALLEL_MIN_SIZE = 8 * 1024 * 1024
+PARALLEL_CONNECTIONS = 4
+# Files up to this size are buffered in memory and uploaded from there,
+# skipping the write-to-disk/read-back round trip entirely
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+# At most this many in-memory spools at once (caps spool RSS at
+# SPOOL_POOL_SIZE * SPOOL_MAX_SIZE); further downloads use the disk path
+SPOOL_POOL_SIZE = 8
+# Downloads running at once across all users; further requests queue
+MAX_CONCURRENT_DOWNLOADS = 4
 ALLOWED_EXTENSIONS = {
     '.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm',
     '.mp3', '.wav', '.ogg', '.m4a', '.flac',
@@ -37,118 +60,83 @@ ALLOWED_EXTENSIONS = {
     '.apk', '.exe', '.dmg', '.iso'
 }
 
-class TelegramDownloadBot:
-    def __init__(self):
-        self.active_downloads = {}
-        self.download_stats = {}
-        self.temp_dir = tempfile.mkdtemp(prefix="tg_downloads_")
-        logger.info(f"Created temp directory: {self.temp_dir}")
-        
-        # Ensure temp directory exists
-        if not os.path.exists(self.temp_dir):
-            os.makedirs(self.temp_dir, exist_ok=True)
-    
-    # ===== Helper Functions =====
-    
-    def clean_filename(self, filename: str) -> str:
-        """Clean filename by removing invalid characters"""
-        # Remove query strings and fragments
-        filename = filename.split('?')[0].split('#')[0]
-        # Remove invalid characters
-        filename = re.sub(r'[<>:"/\\|?*]', '', filename)
-        # Replace spaces with underscores
-        filename = filename.replace(' ', '_')
-        # Limit length
-        if len(filename) > 100:
-            name, ext = os.path.splitext(filename)
-            filename = name[:95] + ext
-        return filename
-    
-    def extract_filename_from_url(self, url: str, content_type: str = None) -> str:
-        """Extract filename from URL"""
-        try:
-            parsed = urlparse(url)
-            path = unquote(parsed.path)
-            filename = os.path.basename(path)
-            
-            if filename:
-                filename = self.clean_filename(filename)
-                # Ensure it has an extension
-                if '.' not in filename and content_type:
-                    ext = mimetypes.guess_extension(content_type)
-                    if ext:
-                        filename += ext
-                return filename
-            
-            # If no filename in URL, generate one
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            if content_type:
-                ext = mimetypes.guess_extension(content_type) or '.bin'
-                return f"download_{timestamp}{ext}"
-            return f"download_{timestamp}.bin"
-            
-        except Exception as e:
-            logger.error(f"Error extracting filename: {e}")
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            return f"download_{timestamp}.bin"
-    
-    def is_valid_url(self, url: str) -> bool:
-        """Validate URL format"""
-        pattern = re.compile(
-            r'^https?://'  # http:// or https://
-            r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+[A-Z]{2,6}\.?|'  # domain
-            r'localhost|'  # localhost
-            r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})'  # IP
-            r'(?::\d+)?'  # port
-            r'(?:/?|[/?]\S+)$', re.IGNORECASE)
-        return bool(pattern.match(url))
-    
-    def get_file_info(self, url: str) -> Tuple[Optional[int], Optional[str]]:
-        """Get file size and type from URL headers"""
-        try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            }
-            response = requests.head(url, headers=headers, allow_redirects=True, timeout=10)
-            response.raise_for_status()
-            
-            size = int(response.headers.get('content-length', 0))
-            content_type = response.headers.get('content-type', '')
-            
-            # If HEAD doesn't give size, try GET with range
-            if size == 0:
-                response = requests.get(url, headers=headers, stream=True, timeout=5)
-                size = int(response.headers.get('content-length', 0))
-                content_type = response.headers.get('content-type', content_type)
-            
-            return size, content_type
-        except Exception as e:
-            logger.error(f"Error getting file info: {e}")
-            return None, None
-    
-    def format_size(self, size_bytes: int) -> str:
-        """Convert bytes to human readable format"""
-        if size_bytes == 0:
-            return "0B"
-        units = ['B', 'KB', 'MB', 'GB', 'TB']
-        i = 0
-        while size_bytes >= 1024 and i < len(units) - 1:
-            size_bytes /= 1024.0
-            i += 1
-        return f"{size_bytes:.2f} {units[i]}"
-    
-    def is_extension_allowed(self, filename: str) -> bool:
-        """Check if file extension is allowed"""
-        _, ext = os.path.splitext(filename.lower())
-        return ext in ALLOWED_EXTENSIONS or ext == ''  # Allow files without extension
-    
-    # ===== Bot Command Handlers =====
-    
-    async def start_command(self, update: Update, context: CallbackContext):
-        """Handle /start command"""
-        user = update.effective_user
-        welcome_text = f"""
-🤖 Welcome {user.first_name}!
+_ALLOWED = frozenset(e.lower() for e in ALLOWED_EXTENSIONS)
+
+# Upload dispatch by extension - cheaper than a mimetypes.guess_type walk
+# and the extension is already known from the allowlist check. Anything
+# not listed here goes out as a plain document.
+_EXT_KIND = {
+    **dict.fromkeys(('.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm'), 'video'),
+    **dict.fromkeys(('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp'), 'photo'),
+    **dict.fromkeys(('.mp3', '.wav', '.ogg', '.m4a', '.flac'), 'audio'),
+}
+
+# Precompiled patterns (hot per-message paths).
+# Host check is a simple character-class match: the old nested-group domain
+# regex showed super-linear backtracking on pathological inputs.
+_HOST_RE = re.compile(r'^[A-Za-z0-9.\-]{1,253}$')
+_UNITS = ('B', 'KB', 'MB', 'GB', 'TB')
+# One-pass table: strip invalid characters, map spaces to underscores
+_FN_TRANS = str.maketrans({' ': '_', '<': None, '>': None, ':': None,
+                           '"': None, '/': None, '\\': None, '|': None,
+                           '?': None, '*': None})
+
+# ===== Helper Functions =====
+# Pure-Python versions; replaced by the compiled bot_utils module below
+# when it has been built (python setup.py build_ext --inplace).
+
+def clean_filename(filename: str) -> str:
+    """Clean filename by removing invalid characters"""
+    # Remove query strings and fragments
+    filename = filename.split('?')[0].split('#')[0]
+    # Strip invalid characters and replace spaces in one pass
+    filename = filename.translate(_FN_TRANS)
+    # Limit length
+    if len(filename) > 100:
+        name, ext = os.path.splitext(filename)
+        filename = name[:95] + ext
+    return filename
+
+def is_valid_url(url: str) -> bool:
+    """Validate URL format"""
+    if not url.startswith(('http://', 'https://')):
+        return False  # reject plain chat text before any parsing
+    try:
+        parts = urlsplit(url)
+        host = parts.hostname
+    except ValueError:
+        return False
+    return (parts.scheme in ('http', 'https')
+            and host is not None
+            and _HOST_RE.match(host) is not None)
+
+def format_size(size_bytes: int) -> str:
+    """Convert bytes to human readable format"""
+    if size_bytes <= 0:
+        return "0B"
+    # Pick the unit straight from the bit length (1024 = 10 bits per unit)
+    i = min(max((int(size_bytes).bit_length() - 1) // 10, 0), 4)
+    return f"{size_bytes / (1 << (i * 10)):.2f} {_UNITS[i]}"
+
+try:
+    # Optional compiled implementations of the per-message string helpers
+    from bot_utils import clean_filename, format_size, is_valid_url  # noqa: F811
+except ImportError:
+    pass
+
+# Users retry the same links and the big CDNs serve the same content
+# types, so memoize validation and the mime-DB walk. Bound both caches
+# so abusive traffic can't grow them without limit. Wrapping here picks
+# up the compiled is_valid_url when bot_utils is built.
+_is_valid_url_cached = lru_cache(maxsize=2048)(is_valid_url)
+_ext_for_ct = lru_cache(maxsize=1024)(mimetypes.guess_extension)
+
+# Static command texts, rendered once at import; only the user's name in
+# the welcome message is dynamic.
+_MAX_SIZE_STR = format_size(MAX_FILE_SIZE)
+
+_WELCOME_TMPL = f"""
+🤖 Welcome {{name}}!
 
 I'm your personal download assistant. I can download files from direct links and send them to you.
 
@@ -165,7 +153,7 @@ Supported files:
 • Apps (APK, EXE, DMG, etc.)
 
 Limits:
-• Max file size: {self.format_size(MAX_FILE_SIZE)} (Telegram limit)
+• Max file size: {_MAX_SIZE_STR} (Telegram limit)
 • Direct links only (no streaming sites)
 
 Commands:
@@ -175,11 +163,8 @@ Commands:
 
 Just send me a link to get started!
         """
-        await update.message.reply_text(welcome_text)
-    
-    async def help_command(self, update: Update, context: CallbackContext):
-        """Handle /help command"""
-        help_text = f"""
+
+_HELP_TEXT = f"""
 📚 Help Guide
 
 What I can download:
@@ -194,20 +179,171 @@ How to use:
 3. I'll handle the rest!
 
 File size limits:
-• Maximum: {self.format_size(MAX_FILE_SIZE)} (Telegram Bot API limit)
+• Maximum: {_MAX_SIZE_STR} (Telegram Bot API limit)
 • Larger files will be rejected automatically
 
 Troubleshooting:
 ❌ "Invalid URL" - Make sure it starts with http:// or https://
-❌ "File too large" - File exceeds {self.format_size(MAX_FILE_SIZE)}
+❌ "File too large" - File exceeds {_MAX_SIZE_STR}
 ❌ "Download failed" - Server might be blocking bots or link is broken
 ❌ "Unsupported file" - File type not in allowed list
 
 Need help?
 Just send me a link and I'll try to download it!
         """
-        
-        await update.message.reply_text(help_text)
+
+class BoundedDict(OrderedDict):
+    """Dict that evicts its oldest entry once it grows past a fixed cap.
+
+    The cleanup paths should keep these maps near-empty; the cap is a
+    backstop so a missed removal can never grow into a real leak.
+    """
+
+    def __init__(self, cap: int):
+        super().__init__()
+        self.cap = cap
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        if len(self) > self.cap:
+            self.popitem(last=False)
+
+
+class TelegramDownloadBot:
+    __slots__ = ('active_downloads', 'download_stats', '_lock', '_spool_pool',
+                 '_download_sem', '_cleanup_task', '_health_runner', 'session',
+                 'temp_dir')
+
+    def __init__(self):
+        self.active_downloads = BoundedDict(1024)
+        self.download_stats = BoundedDict(1024)
+        self._lock = asyncio.Lock()  # guards active_downloads under concurrent handlers
+        # Reusable in-memory spool buffers; an empty pool means enough
+        # downloads are in flight that new ones should spill to disk
+        self._spool_pool: asyncio.Queue = asyncio.Queue(maxsize=SPOOL_POOL_SIZE)
+        for _ in range(SPOOL_POOL_SIZE):
+            self._spool_pool.put_nowait(io.BytesIO())
+        self._download_sem = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+        self._cleanup_task: Optional[asyncio.Task] = None
+        self._health_runner: Optional[web.AppRunner] = None
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.temp_dir = tempfile.mkdtemp(prefix="tg_downloads_")
+        logger.info(f"Created temp directory: {self.temp_dir}")
+
+        # Ensure temp directory exists
+        if not os.path.exists(self.temp_dir):
+            os.makedirs(self.temp_dir, exist_ok=True)
+
+    # ===== Lifecycle Hooks =====
+
+    async def _startup(self, application: Application):
+        """Create the shared HTTP session once the event loop is running"""
+        self.session = aiohttp.ClientSession(
+            headers={
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+            },
+            timeout=aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=60),
+            # Users mostly pull from a handful of CDNs: keep warm
+            # connections per host, cache DNS, and cap total sockets so a
+            # burst can't exhaust file descriptors.
+            connector=aiohttp.TCPConnector(
+                limit=32,
+                limit_per_host=8,
+                ttl_dns_cache=600,
+                enable_cleanup_closed=True,
+                keepalive_timeout=75,
+            )
+        )
+        logger.info("Created shared HTTP session")
+
+        # Periodic reaper: catches leftovers from previous runs and any
+        # file the per-download cleanup missed
+        self._cleanup_task = asyncio.create_task(self._cleanup_loop())
+
+        # In polling mode the exposed port still needs a health endpoint
+        # (webhook mode serves it itself). Run it on the bot's event loop
+        # instead of a thread so requests don't contend for the GIL.
+        if not WEBHOOK_URL:
+            app = web.Application()
+            app.router.add_get('/', self._health)
+            self._health_runner = web.AppRunner(app)
+            await self._health_runner.setup()
+            site = web.TCPSite(self._health_runner, '0.0.0.0', PORT)
+            await site.start()
+            logger.info(f"✅ Health server on port {PORT}")
+
+    async def _shutdown(self, application: Application):
+        """Stop background work and close the shared HTTP session"""
+        if self._cleanup_task is not None:
+            self._cleanup_task.cancel()
+            self._cleanup_task = None
+        if self._health_runner is not None:
+            await self._health_runner.cleanup()
+            self._health_runner = None
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def _health(self, request: web.Request) -> web.Response:
+        """Health-check endpoint for the hosting platform"""
+        return web.Response(text='Bot is alive!')
+
+    async def _cleanup_loop(self):
+        """Reap stale temp files at startup and every 10 minutes after"""
+        while True:
+            await self.cleanup_temp_files()
+            await asyncio.sleep(600)
+
+    # ===== Helper Methods =====
+
+    def extract_filename_from_url(self, url: str, content_type: str = None) -> str:
+        """Extract filename from URL"""
+        try:
+            parsed = urlparse(url)
+            path = unquote(parsed.path)
+            filename = os.path.basename(path)
+            
+            if filename:
+                filename = clean_filename(filename)
+                # Ensure it has an extension
+                if '.' not in filename and content_type:
+                    ext = _ext_for_ct(content_type)
+                    if ext:
+                        filename += ext
+                return filename
+            
+            # If no filename in URL, generate one
+            timestamp = time.strftime("%Y%m%d_%H%M%S")
+            if content_type:
+                ext = _ext_for_ct(content_type) or '.bin'
+                return f"download_{timestamp}{ext}"
+            return f"download_{timestamp}.bin"
+            
+        except Exception as e:
+            logger.error(f"Error extracting filename: {e}")
+            timestamp = time.strftime("%Y%m%d_%H%M%S")
+            return f"download_{timestamp}.bin"
+    
+    def is_extension_allowed(self, filename: str) -> bool:
+        """Check if file extension is allowed"""
+        dot = filename.rfind('.')
+        # Like os.path.splitext, a dot with nothing but dots before it
+        # ('.bashrc') is not an extension separator
+        if dot <= 0 or not filename[:dot].lstrip('.'):
+            return True  # Allow files without extension
+        return filename[dot:].lower() in _ALLOWED
+    
+    # ===== Bot Command Handlers =====
+    
+    async def start_command(self, update: Update, context: CallbackContext):
+        """Handle /start command"""
+        user = update.effective_user
+        await update.message.reply_text(_WELCOME_TMPL.format(name=user.first_name))
+    
+    async def help_command(self, update: Update, context: CallbackContext):
+        """Handle /help command"""
+        await update.message.reply_text(_HELP_TEXT)
 
     async def status_command(self, update: Update, context: CallbackContext):
         """Handle /status command"""
@@ -218,7 +354,7 @@ Just send me a link and I'll try to download it!
 📊 Bot Status
 • Active downloads: {active_count}
 • Server time: {bot_uptime}
-• Max file size: {self.format_size(MAX_FILE_SIZE)}
+• Max file size: {_MAX_SIZE_STR}
 • Ready: ✅
 
 Storage:
@@ -227,124 +363,205 @@ Storage:
         """
         await update.message.reply_text(status_text)
     
+    async def invalid_link_message(self, update: Update, context: CallbackContext):
+        """Reply to plain text that is not an http(s) link"""
+        await update.message.reply_text("❌ Invalid URL\n"
+                                      "Please send a valid HTTP/HTTPS link starting with http:// or https://")
+
     async def handle_url_message(self, update: Update, context: CallbackContext):
         """Handle URL messages"""
         user_id = update.effective_user.id
         url = update.message.text.strip()
         
         # Check if already downloading
-        if user_id in self.active_downloads:
+        async with self._lock:
+            already_active = user_id in self.active_downloads
+        if already_active:
             await update.message.reply_text("⏳ You already have a download in progress. "
                                           "Wait")
             return
         
         # Validate URL
-        if not self.is_valid_url(url):
+        if not _is_valid_url_cached(url):
             await update.message.reply_text("❌ Invalid URL\n"
                                           "Please send a valid HTTP/HTTPS link starting with http:// or https://")
             return
         
         # Send initial status
         status_msg = await update.message.reply_text("🔍 Analyzing URL...")
-        
+
+        source = None
         try:
-            # Get file info
-            file_size, content_type = self.get_file_info(url)
-            
-            if file_size is None:
-                await status_msg.edit_text("❌ Cannot access file\n"
-                                         "The server might be blocking bots or the link is invalid.")
-                return
-            
-            # Check file size
-            if file_size > MAX_FILE_SIZE:
-                size_readable = self.format_size(file_size)
-                max_readable = self.format_size(MAX_FILE_SIZE)
-                await status_msg.edit_text(f"❌ File too large\n"
-                                         f"Size: {size_readable}\n"
-                                         f"Limit: {max_readable}\n"
-                                         f"\nPlease use a smaller file.")
-                return
-            
-            # Extract filename
-            filename = self.extract_filename_from_url(url, content_type)
-            
-            # Check file extension
-            if not self.is_extension_allowed(filename):
-                await status_msg.edit_text(f"⚠️ Unsupported file type\n"
-                                         f"File: {filename}\n"
-                                         f"\nI support common file types only.")
-                return
-            
-            # Show file info
-            size_readable = self.format_size(file_size)
-            file_type = content_type.split(';')[0] if content_type else 'Unknown'
-            
-            await status_msg.edit_text(f"📄 File Info\n"
-                                     f"Name: {filename}\n"
-                                     f"Size: {size_readable}\n"
-                                     f"Type: {file_type}\n"
-                                     f"\n Download in progress... ⏳")
-            
-            # Start download
-            self.active_downloads[user_id] = filename
-            
-            filepath = os.path.join(self.temp_dir, filename)
+            # Register before the transfer starts so a second link from
+            # the same user is rejected while this one is in flight
+            async with self._lock:
+                self.active_downloads[user_id] = url
 
-            # Download with progress
-            success = await self.download_file(url, filepath, status_msg, user_id, filename)
-            
-            if not success:
-                if user_id in self.active_downloads:
-                    del self.active_downloads[user_id]
+            # Single streaming GET: headers are validated and the body is
+            # downloaded over the same connection (no pre-flight HEAD).
+            # The semaphore caps downloads running at once across users.
+            async with self._download_sem:
+                result = await self.download_file(url, status_msg, user_id)
+
+            if result is None:
                 return
-                
+
+            source, filename = result
+
             # Send file to user
-            await self.send_file_to_user(update, filepath, filename, status_msg)
-            
-            # Clean up
-            if user_id in self.active_downloads:
-                del self.active_downloads[user_id]
-            if os.path.exists(filepath):
-                os.remove(filepath)
-            
+            await self.send_file_to_user(update, source, filename, status_msg)
+
         except Exception as e:
             logger.error(f"Error in handle_url_message: {e}")
             await status_msg.edit_text(f"❌ Error\n"
                                      f"\n{str(e)[:200]}\n\n"
                                      f"\nPlease try again or use a different link.")
-            user_id = update.effective_user.id
-            if user_id in self.active_downloads:
-                filename = self.active_downloads[user_id]
-                del self.active_downloads[user_id]
+        finally:
+            # Runs on every exit path, so no entry can leak
+            async with self._lock:
+                self.active_downloads.pop(user_id, None)
+            self.download_stats.pop(user_id, None)
+            if isinstance(source, io.BytesIO):
+                self._release_spool(source)
+            elif isinstance(source, str) and os.path.exists(source):
+                os.remove(source)
     
-    async def download_file(self, url: str, filepath: str, status_msg, user_id: int, filename: str) -> bool:
-        """Download file with measuring speed"""
+    async def download_file(self, url: str, status_msg, user_id: int) -> Optional[Tuple['str | io.BytesIO', str]]:
+        """Validate and download a file over a single streaming GET.
+
+        Size, type and filename come from the response headers of the same
+        request that streams the body, so no pre-flight HEAD is needed.
+        Returns (source, filename) on success, where source is a temp-file
+        path or, for small files, an in-memory buffer; on rejection or
+        failure edits status_msg with the reason and returns None.
+        """
+        buf: Optional[io.BytesIO] = None
         try:
             start_time = time.time()
-            
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            }
-            response = requests.get(url, headers=headers, stream=True, timeout=30)
-            response.raise_for_status()
-            
-            total_size = int(response.headers.get('content-length', 0))
-            
-            # Download with measuring speed
-            with open(filepath, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-            
+
+            # 'Range: bytes=0-' requests the whole body but coaxes servers
+            # that only report sizes on ranged requests into sending
+            # Content-Range; it also marks range support (206) for free.
+            async with self.session.get(url, headers={'Range': 'bytes=0-'}) as response:
+                response.raise_for_status()
+
+                if response.status == 206:
+                    # Content-Range: bytes 0-12344/12345
+                    total = response.headers.get('content-range', '').rpartition('/')[2]
+                    total_size = int(total) if total.isdigit() else 0
+                else:
+                    total_size = int(response.headers.get('content-length', 0))
+                content_type = response.headers.get('content-type', '')
+
+                # Check file size
+                if total_size > MAX_FILE_SIZE:
+                    await status_msg.edit_text(f"❌ File too large\n"
+                                             f"Size: {format_size(total_size)}\n"
+                                             f"Limit: {_MAX_SIZE_STR}\n"
+                                             f"\nPlease use a smaller file.")
+                    return None
+
+                # Extract filename and check its extension
+                filename = self.extract_filename_from_url(url, content_type)
+                if not self.is_extension_allowed(filename):
+                    await status_msg.edit_text(f"⚠️ Unsupported file type\n"
+                                             f"File: {filename}\n"
+                                             f"\nI support common file types only.")
+                    return None
+
+                # Show file info
+                file_type = content_type.split(';')[0] if content_type else 'Unknown'
+                await status_msg.edit_text(f"📄 File Info\n"
+                                         f"Name: {filename}\n"
+                                         f"Size: {format_size(total_size)}\n"
+                                         f"Type: {file_type}\n"
+                                         f"\n Download in progress... ⏳")
+
+                filepath = os.path.join(self.temp_dir, filename)
+
+                source: 'str | io.BytesIO' = filepath
+
+                if response.status == 206 and total_size >= PARALLEL_MIN_SIZE:
+                    # The server honours ranges and the file is large
+                    # enough to split: drop this connection and pull the
+                    # body over several ranged connections instead, which
+                    # sidesteps per-connection throttling on CDNs.
+                    response.close()
+                    await self._download_ranges(url, filepath, total_size,
+                                                status_msg, filename)
+                elif 0 < total_size <= SPOOL_MAX_SIZE and (buf := self._checkout_spool()) is not None:
+                    # Small files never touch disk: buffer in memory and
+                    # upload straight from there. Fast enough that no
+                    # progress edits are worth sending.
+                    async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                        buf.write(chunk)
+                    source = buf
+                else:
+                    downloaded = 0
+                    progress = {'last_bucket': -1, 'last_edit': 0.0}
+
+                    # Pipeline socket reads and disk writes: the bounded queue
+                    # lets the next chunk arrive while the previous one is
+                    # still being written (None is the end-of-stream marker).
+                    queue: asyncio.Queue = asyncio.Queue(maxsize=8)
+
+                    async def _writer():
+                        async with aiofiles.open(filepath, 'wb') as f:
+                            if total_size and hasattr(os, 'posix_fallocate'):
+                                # Reserve the blocks up front so the
+                                # filesystem is not repeatedly extending
+                                # the file as chunks land (off the loop:
+                                # glibc may emulate by writing zeros)
+                                await asyncio.to_thread(
+                                    os.posix_fallocate, f.fileno(), 0, total_size)
+                            while True:
+                                chunk = await queue.get()
+                                if chunk is None:
+                                    return
+                                await f.write(chunk)
+
+                    writer = asyncio.create_task(_writer())
+
+                    async def _feed(item):
+                        # Race the put against the writer: a writer that
+                        # died mid-stream (full disk, I/O error) never
+                        # drains the queue again, and a plain put on the
+                        # full queue would block this handler forever.
+                        put = asyncio.create_task(queue.put(item))
+                        await asyncio.wait({put, writer},
+                                           return_when=asyncio.FIRST_COMPLETED)
+                        if not put.done():
+                            put.cancel()
+                        if writer.done():
+                            await writer  # surface the disk-write error
+
+                    try:
+                        async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                            await _feed(chunk)
+                            downloaded += len(chunk)
+
+                            if total_size:
+                                await self._edit_progress(status_msg, filename,
+                                                          downloaded, total_size,
+                                                          progress)
+
+                        await _feed(None)
+                        await writer
+                    finally:
+                        if not writer.done():
+                            writer.cancel()
+
             end_time = time.time()
             download_time = end_time - start_time
-            
+
             # Calculate average speed
-            file_size = os.path.getsize(filepath)
+            if isinstance(source, io.BytesIO):
+                file_size = source.getbuffer().nbytes
+            else:
+                file_size = os.path.getsize(source)
             if download_time > 0:
                 avg_speed = file_size / download_time  # bytes per second
-                avg_speed_str = self.format_size(avg_speed) + "/s"
+                avg_speed_str = format_size(avg_speed) + "/s"
             else:
                 avg_speed_str = "N/A"
             
@@ -354,19 +571,125 @@ Storage:
                 'avg_speed': avg_speed_str,
                 'file_size': file_size
             }
-            
-            return True
-            
+
+            return source, filename
+
         except Exception as e:
             logger.error(f"Download error: {e}")
+            if buf is not None:
+                self._release_spool(buf)
             await status_msg.edit_text(f"❌ Download Failed\nError: {str(e)[:100]}")
-            return False
+            return None
+
+    async def _edit_progress(self, status_msg, filename: str, downloaded: int,
+                             total_size: int, state: dict):
+        """Coalesced progress edit: only when the 5% bucket advanced and at
+        least 2 seconds passed since the previous edit, to stay clear of
+        Telegram's rate limits on medium/large files."""
+        bucket = downloaded * 100 // total_size // 5
+        now = time.monotonic()
+        if bucket == state['last_bucket'] or (now - state['last_edit']) <= 2.0:
+            return
+        state['last_bucket'] = bucket
+        state['last_edit'] = now
+        try:
+            await status_msg.edit_text(
+                f"⬇️ Downloading {filename}\n"
+                f"Progress: {min(bucket * 5, 100)}% "
+                f"({format_size(downloaded)} / {format_size(total_size)})"
+            )
+        except TelegramError as e:
+            # "Message is not modified", RetryAfter, a timed-out edit -
+            # all cosmetic; never abort the download they report on
+            logger.debug(f"Progress edit failed: {e}")
+
+    def _checkout_spool(self) -> Optional[io.BytesIO]:
+        """Take a spool buffer from the pool, or None if all are in use"""
+        try:
+            return self._spool_pool.get_nowait()
+        except asyncio.QueueEmpty:
+            return None
+
+    def _release_spool(self, buf: io.BytesIO):
+        """Reset a spool buffer and return it to the pool"""
+        buf.seek(0)
+        buf.truncate(0)
+        self._spool_pool.put_nowait(buf)
+
+    async def _download_ranges(self, url: str, filepath: str, total_size: int,
+                               status_msg, filename: str):
+        """Download a file over several concurrent ranged connections.
+
+        The file is preallocated and each task pwrites its range at the
+        right offset, so no reassembly pass is needed. Only called when
+        the server already answered 206 for this URL.
+        """
+        part = -(-total_size // PARALLEL_CONNECTIONS)  # ceil division
+        progress = {'downloaded': 0, 'last_bucket': -1, 'last_edit': 0.0}
+
+        fd = os.open(filepath, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            # Reserve the blocks up front: cheaper metadata updates and
+            # no fragmentation from four writers extending the file
+            # (off the loop: glibc may emulate by writing zeros; absent
+            # entirely on macOS)
+            if hasattr(os, 'posix_fallocate'):
+                await asyncio.to_thread(os.posix_fallocate, fd, 0, total_size)
+
+            async def fetch(start: int, end: int):
+                headers = {'Range': f'bytes={start}-{end}'}
+                async with self.session.get(url, headers=headers) as r:
+                    if r.status != 206:
+                        raise RuntimeError(
+                            f"server stopped honouring ranges (HTTP {r.status})")
+                    offset = start
+                    async for chunk in r.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                        await asyncio.to_thread(os.pwrite, fd, chunk, offset)
+                        offset += len(chunk)
+                        progress['downloaded'] += len(chunk)
+
+                        await self._edit_progress(status_msg, filename,
+                                                  progress['downloaded'],
+                                                  total_size, progress)
+
+            tasks = [
+                asyncio.create_task(fetch(i * part,
+                                          min((i + 1) * part, total_size) - 1))
+                for i in range(PARALLEL_CONNECTIONS) if i * part < total_size
+            ]
+            try:
+                await asyncio.gather(*tasks)
+            finally:
+                # One failed range must take its siblings down with it:
+                # cancel them and wait until they have actually stopped,
+                # or they would keep pwriting to fd after it is closed
+                # below (and a recycled fd number means someone else's
+                # file).
+                for t in tasks:
+                    t.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            os.close(fd)
     
-    async def send_file_to_user(self, update: Update, filepath: str, filename: str, status_msg):
-        """Send downloaded file to user with download stats"""
+    async def send_file_to_user(self, update: Update, source: 'str | io.BytesIO',
+                                filename: str, status_msg):
+        """Send downloaded file (temp-file path or in-memory buffer) to user
+        with download stats"""
+        file_handle = None
         try:
             user_id = update.effective_user.id
-            file_size = os.path.getsize(filepath)
+            # Small files come in as an in-memory buffer handed over as
+            # bytes. Large ones come in as a path: keep the handle open
+            # and let httpx stream the multipart body from disk, instead
+            # of PTB reading the whole file into one bytes object.
+            if isinstance(source, io.BytesIO):
+                payload = source.getvalue()
+                file_size = len(payload)
+            else:
+                file_size = os.path.getsize(source)
+                file_handle = open(source, 'rb')
+                payload = InputFile(file_handle, filename=filename,
+                                    read_file_handle=False)
             
             # Get download stats if available
             stats = self.download_stats.get(user_id, {})
@@ -385,73 +708,84 @@ Storage:
             await status_msg.edit_text(
                 f"✅ Download Complete!\n"
                 f"File: {filename}\n"
-                f"Size: {self.format_size(file_size)}\n"
+                f"Size: {format_size(file_size)}\n"
                 f"Time: {time_str}\n"
                 f"Avg Speed: {avg_speed}\n"
                 f"\n📤 Uploading to Telegram..."
             )
             
             # Remove stats after showing
-            if user_id in self.download_stats:
-                del self.download_stats[user_id]
+            self.download_stats.pop(user_id, None)
         
             # Determine file type and send appropriately
-            mime_type, _ = mimetypes.guess_type(filepath)
-            
-            with open(filepath, 'rb') as file:
-                if mime_type and mime_type.startswith('video/'):
-                    await update.message.reply_video(
-                        video=InputFile(file, filename=filename),
-                        caption=f"🎬 {filename}",
-                        supports_streaming=True
-                    )
-                elif mime_type and mime_type.startswith('image/'):
-                    await update.message.reply_photo(
-                        photo=InputFile(file, filename=filename),
-                        caption=f"🖼️ {filename}"
-                    )
-                elif mime_type and mime_type.startswith('audio/'):
-                    await update.message.reply_audio(
-                        audio=InputFile(file, filename=filename),
-                        caption=f"🎵 {filename}"
-                    )
-                else:
-                    await update.message.reply_document(
-                        document=InputFile(file, filename=filename),
-                        caption=f"📁 {filename}"
-                    )
-            
+            kind = _EXT_KIND.get(os.path.splitext(filename)[1].lower(), 'document')
+
+            if kind == 'video':
+                await update.message.reply_video(
+                    video=payload,
+                    filename=filename,
+                    caption=f"🎬 {filename}",
+                    supports_streaming=True
+                )
+            elif kind == 'photo':
+                await update.message.reply_photo(
+                    photo=payload,
+                    filename=filename,
+                    caption=f"🖼️ {filename}"
+                )
+            elif kind == 'audio':
+                await update.message.reply_audio(
+                    audio=payload,
+                    filename=filename,
+                    caption=f"🎵 {filename}"
+                )
+            else:
+                await update.message.reply_document(
+                    document=payload,
+                    filename=filename,
+                    caption=f"📁 {filename}"
+                )
+
             await status_msg.delete()
-            
+
         except Exception as e:
             logger.error(f"Error sending file: {e}")
             # Try to send as document if specific type fails
             try:
-                with open(filepath, 'rb') as file:
-                    await update.message.reply_document(
-                        document=InputFile(file, filename=filename),
-                        caption=f"📁 {filename}",
-                    )
+                if file_handle is not None:
+                    file_handle.seek(0)  # first attempt may have read part of it
+                await update.message.reply_document(
+                    document=payload,
+                    filename=filename,
+                    caption=f"📁 {filename}",
+                )
                 await status_msg.delete()
             except Exception as e2:
                 await status_msg.edit_text(f"❌ Upload Failed\n"
                                          f"Error: {str(e2)[:100]}\n"
                                          f"\nFile might be too large or format not supported.")
+        finally:
+            if file_handle is not None:
+                file_handle.close()
     
     async def cleanup_temp_files(self):
-        """Clean up temporary files periodically"""
+        """Clean up temporary files without blocking the event loop"""
+        await asyncio.to_thread(self._cleanup_sync)
+
+    def _cleanup_sync(self):
+        """Scan the temp directory and remove files older than 1 hour"""
         try:
-            for filename in os.listdir(self.temp_dir):
-                filepath = os.path.join(self.temp_dir, filename)
-                try:
-                    # Remove files older than 1 hour
-                    if os.path.isfile(filepath):
-                        file_age = datetime.now().timestamp() - os.path.getmtime(filepath)
-                        if file_age > 3600:  # 1 hour
-                            os.remove(filepath)
-                            logger.info(f"Cleaned up old file: {filename}")
-                except Exception as e:
-                    logger.error(f"Error cleaning up {filename}: {e}")
+            now = time.time()
+            with os.scandir(self.temp_dir) as it:
+                for entry in it:
+                    try:
+                        # Remove files older than 1 hour
+                        if entry.is_file(follow_symlinks=False) and \
+                                (now - entry.stat().st_mtime) > 3600:
+                            os.unlink(entry.path)
+                            logger.info(f"Cleaned up old file: {entry.name}")
+                    except Exception as e:
+                        logger.error(f"Error cleaning up {entry.name}: {e}")
         except Exception as e:
             logger.error(f"Error in cleanup: {e}")
     
@@ -464,11 +798,20 @@ Storage:
         application.add_handler(CommandHandler("help", self.help_command))
         application.add_handler(CommandHandler("status", self.status_command))
         
-        # URL handler
+        # URL handler - the Regex filter keeps non-URL chat from ever
+        # reaching handle_url_message (\s* because the handler strips
+        # the text, so a pasted leading space must not change routing)
         application.add_handler(MessageHandler(
-            filters.TEXT & ~filters.COMMAND, 
+            filters.TEXT & ~filters.COMMAND & filters.Regex(r'^\s*https?://'),
             self.handle_url_message
         ))
+        # Anything else that is plain text still gets the invalid-URL
+        # reply the help text promises (only the first match in a group
+        # runs, so this never shadows the handler above)
+        application.add_handler(MessageHandler(
+            filters.TEXT & ~filters.COMMAND,
+            self.invalid_link_message
+        ))
         
         # Error handler
         async def error_handler(update: Update, context: CallbackContext):
@@ -476,12 +819,42 @@ Storage:
             
         application.add_error_handler(error_handler)
     
-    def run_polling(self):
-        """Run bot with polling (for local testing)"""
-        application = Application.builder().token(BOT_TOKEN).build()
+    def run(self):
+        """Run bot with webhook when WEBHOOK_URL is set, else polling (local testing)"""
+        application = (
+            Application.builder()
+            .token(BOT_TOKEN)
+            # HTTP/2 multiplexes concurrent uploads to api.telegram.org
+            # over one connection, avoiding head-of-line blocking
+            .http_version('2')
+            # Process updates concurrently; PTB's default of one handler
+            # at a time would let a single long download stall every
+            # other user. The actual transfer cap is _download_sem.
+            .concurrent_updates(True)
+            # Throttle all outbound Bot API calls below Telegram's global
+            # 30 msg/s cap so bursts degrade to queueing, not RetryAfter
+            .rate_limiter(AIORateLimiter(overall_max_rate=25, overall_time_period=1))
+            .post_init(self._startup)
+            .post_shutdown(self._shutdown)
+            .build()
+        )
         self.setup_handlers(application)
-        logger.info("Starting bot in polling mode...")
-        application.run_polling()
+
+        if WEBHOOK_URL:
+            # Telegram pushes updates to us - no getUpdates long-poll
+            # round trips, and the webhook server reuses the port Render
+            # already exposes (so no separate health-check server needed).
+            logger.info(f"Starting bot in webhook mode on port {PORT}...")
+            application.run_webhook(
+                listen='0.0.0.0',
+                port=PORT,
+                url_path=BOT_TOKEN,
+                webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{BOT_TOKEN}",
+                drop_pending_updates=True,
+            )
+        else:
+            logger.info("Starting bot in polling mode...")
+            application.run_polling()
 
 # ===== Main Execution =====
 
@@ -512,30 +885,9 @@ def main():
     
 Starting bot...
     """)
-    # Create health server
-    class HealthHandler(BaseHTTPRequestHandler):
-        def do_GET(self):
-            self.send_response(200)
-            self.send_header('Content-type', 'text/plain')
-            self.end_headers()
-            self.wfile.write(b'Bot is alive!')
-
-        def log_message(self, format, *args):
-            pass  # Silence logs
-
-    def run_health_server():
-        port = PORT
-        httpd = HTTPServer(('0.0.0.0', port), HealthHandler)
-        logger.info(f"✅ Health server on port {port}")
-        httpd.serve_forever()
-
-    # Start health server
-    health_thread = threading.Thread(target=run_health_server, daemon=True)
-    health_thread.start()
-    
-    # Create and run bot
+    # Create and run bot (the health endpoint starts with it in _startup)
     bot = TelegramDownloadBot()
-    bot.run_polling()
+    bot.run()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,60 @@
+# cython: language_level=3
+"""Compiled versions of the hot per-message string helpers in bot.py.
+
+Optional: build with `python setup.py build_ext --inplace`. bot.py falls
+back to its pure-Python implementations when this module is absent, so
+the two must stay behaviourally identical.
+"""
+import re
+from urllib.parse import urlsplit
+
+_HOST_RE = re.compile(r'^[A-Za-z0-9.\-]{1,253}$')
+# One-pass table: strip invalid characters, map spaces to underscores
+_FN_TRANS = str.maketrans({' ': '_', '<': None, '>': None, ':': None,
+                           '"': None, '/': None, '\\': None, '|': None,
+                           '?': None, '*': None})
+_UNITS = ('B', 'KB', 'MB', 'GB', 'TB')
+
+
+cpdef str clean_filename(str filename):
+    """Clean filename by removing invalid characters"""
+    cdef Py_ssize_t dot
+    # Remove query strings and fragments
+    filename = filename.split('?')[0].split('#')[0]
+    # Strip invalid characters and replace spaces in one pass
+    filename = filename.translate(_FN_TRANS)
+    # Limit length
+    if len(filename) > 100:
+        dot = filename.rfind('.')
+        # Match os.path.splitext: a dot with nothing but dots before it
+        # (dotfile-style names) is not an extension separator
+        if dot <= 0 or not filename[:dot].lstrip('.'):
+            filename = filename[:95]
+        else:
+            filename = filename[:min(dot, 95)] + filename[dot:]
+    return filename
+
+
+cpdef bint is_valid_url(str url):
+    """Validate URL format"""
+    if not url.startswith(('http://', 'https://')):
+        return False  # reject plain chat text before any parsing
+    try:
+        parts = urlsplit(url)
+        host = parts.hostname
+    except ValueError:
+        return False
+    return (parts.scheme in ('http', 'https')
+            and host is not None
+            and _HOST_RE.match(host) is not None)
+
+
+cpdef str format_size(double size_bytes):
+    """Convert bytes to human readable format"""
+    cdef int i = 0
+    if size_bytes <= 0:
+        return "0B"
+    while size_bytes >= 1024 and i < 4:
+        size_bytes /= 1024.0
+        i += 1
+    return f"{size_bytes:.2f} {_UNITS[i]}"
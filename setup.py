@@ -0,0 +1,14 @@
+"""Build script for the optional compiled helper module.
+
+Usage: pip install cython && python setup.py build_ext --inplace
+
+The bot runs without it; bot.py falls back to pure-Python helpers when
+bot_utils has not been built.
+"""
+from setuptools import Extension, setup
+from Cython.Build import cythonize
+
+setup(
+    name='file-downloader-bot',
+    ext_modules=cythonize([Extension('bot_utils', ['bot_utils.pyx'])]),
+)